@@ -0,0 +1,16 @@
+import os
+
+def atomic_write(path, data):
+    """Write bytes to path so concurrent readers see either the old or the new file, never a partial one."""
+    # The temporary file is per process so workers writing at once don't clobber each other
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.unlink(temp_file)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,21 @@
+# Gunicorn configuration, loaded automatically from the working directory
+
+bind = "0.0.0.0:5005"
+worker_class = "gthread"
+workers = 4
+threads = 8
+
+# Import the app (and load the persisted cache) once in the master, so
+# workers fork with the cache already loaded and share its pages copy-on-write
+preload_app = True
+
+def post_fork(arbiter, worker):
+    from server import start_scheduler
+    from http_session import SESSION
+    
+    # Pooled connections opened by the master must not be shared across processes
+    SESSION.close()
+    
+    # Threads don't survive fork, so every worker arms its own scheduler; one of
+    # them wins the refresh lock and the others reload the cache file it writes
+    start_scheduler()
@@ -0,0 +1,17 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP session so the periodic Overpass and POTA fetches reuse
+# pooled keep-alive connections instead of a new TCP+TLS handshake each time
+SESSION = Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+))
+SESSION.headers['Accept-Encoding'] = 'gzip'
+
+# Seconds to wait for a TCP+TLS connection; every upstream call passes this with
+# its own read timeout so a stalled connection can't hold a refresh forever
+CONNECT_TIMEOUT = 10
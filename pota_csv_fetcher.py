@@ -1,80 +1,136 @@
-import requests
 import json
+import orjson
 import logging
 from datetime import datetime, timedelta
 import os
+import fcntl
 import time
 import csv
-from io import StringIO
+import io
+from http_session import SESSION, CONNECT_TIMEOUT
+from file_utils import atomic_write
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 POTA_DATA_FILE = "pota_data.json"
 LAST_FETCH_FILE = "last_fetch_time.txt"
+FETCH_LOCK_FILE = POTA_DATA_FILE + ".lock"
 FETCH_INTERVAL = timedelta(hours=1)
 CSV_URL = "https://pota.app/all_parks_ext.csv"
+CSV_CHUNK_SIZE = 64 * 1024  # bytes read from the socket per chunk while streaming the CSV
+CSV_READ_TIMEOUT = 60  # seconds without any data before the download is abandoned
 
-def should_fetch_data():
+def load_fetch_state():
+    """Load the last fetch time and the CSV's ETag/Last-Modified validators."""
     if not os.path.exists(LAST_FETCH_FILE):
-        return True
+        return {}
     
     try:
         with open(LAST_FETCH_FILE, 'r') as f:
-            last_fetch_str = f.read().strip()
-            last_fetch = datetime.fromisoformat(last_fetch_str)
-            return datetime.now() - last_fetch >= FETCH_INTERVAL
+            state_str = f.read().strip()
     except Exception as e:
         logger.error(f"Error reading last fetch time: {e}")
-        return True
+        return {}
+    
+    try:
+        return json.loads(state_str)
+    except ValueError:
+        # Older state files only contain the ISO timestamp
+        return {'last_fetch': state_str}
 
-def update_last_fetch_time():
+def get_last_fetch_time():
+    state = load_fetch_state()
+    if not state.get('last_fetch'):
+        return None
+    
+    try:
+        return datetime.fromisoformat(state['last_fetch'])
+    except Exception as e:
+        logger.error(f"Error reading last fetch time: {e}")
+        return None
+
+def should_fetch_data():
+    last_fetch = get_last_fetch_time()
+    return last_fetch is None or datetime.now() - last_fetch >= FETCH_INTERVAL
+
+def update_last_fetch_time(etag=None, last_modified=None):
     try:
         with open(LAST_FETCH_FILE, 'w') as f:
-            f.write(datetime.now().isoformat())
+            json.dump({
+                'last_fetch': datetime.now().isoformat(),
+                'etag': etag,
+                'last_modified': last_modified
+            }, f)
     except Exception as e:
         logger.error(f"Error writing last fetch time: {e}")
 
 def fetch_and_parse_csv(force=False):
     """Fetch and parse the POTA CSV file."""
     try:
-        # Fetch CSV data
-        response = requests.get(CSV_URL)
-        response.raise_for_status()
-        response.encoding = 'utf-8'  # Ensure proper character encoding
+        # Revalidate against the saved copy so an unchanged CSV isn't downloaded again;
+        # a forced reload always downloads the CSV
+        headers = {}
+        state = load_fetch_state() if not force and os.path.exists(POTA_DATA_FILE) else {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
         
-        # Parse CSV
-        elements = []
-        csv_data = StringIO(response.text)
-        reader = csv.reader(csv_data)
-        next(reader)  # Skip header row
-        
-        for row in reader:
-            try:
-                # Extract fields
-                pota_ref = row[0]
-                name = row[1]
-                active = row[2]
+        # Stream CSV data so rows are parsed as they arrive
+        response = SESSION.get(CSV_URL, headers=headers, stream=True,
+                               timeout=(CONNECT_TIMEOUT, CSV_READ_TIMEOUT))
+        with response:
+            if response.status_code == 304:
+                logger.info("POTA CSV not modified since last fetch, using cached data")
+                data = load_data()
+                if data:
+                    update_last_fetch_time(state.get('etag'), state.get('last_modified'))
+                return data
+            
+            response.raise_for_status()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            
+            # Parse CSV straight from the socket. newline='' leaves line endings to the
+            # csv module, so quoted multi-line fields and \r\n split across reads parse
+            # as they did from response.text; decode_content undoes the gzip encoding
+            elements = []
+            response.raw.decode_content = True
+            csv_stream = io.TextIOWrapper(io.BufferedReader(response.raw, CSV_CHUNK_SIZE),
+                                          encoding='utf-8', newline='')
+            reader = csv.reader(csv_stream)
+            next(reader)  # Skip header row
+            
+            # Per-row debug messages use lazy %-style arguments so skipped rows
+            # don't pay for string formatting unless debug logging is enabled
+            for row in reader:
+                # Extract fields (columns 3 and 4 are the entity ID and location description)
+                try:
+                    pota_ref, name, active, _, _, lat_str, lon_str, *_ = row
+                except ValueError:
+                    logger.debug("Skipping invalid row: %s", row)
+                    continue
                 
                 # Skip inactive parks
                 if active != '1':
-                    logger.debug(f"Skipping inactive park {pota_ref}")
+                    logger.debug("Skipping inactive park %s", pota_ref)
                     continue
                 
                 # Skip records without coordinates
-                if not row[5] or not row[6] or row[5] == '' or row[6] == '':
-                    logger.debug(f"Skipping park {pota_ref} due to missing coordinates")
+                if not lat_str or not lon_str:
+                    logger.debug("Skipping park %s due to missing coordinates", pota_ref)
                     continue
                 
                 try:
-                    lat = float(row[5])  # latitude
-                    lon = float(row[6])  # longitude
+                    lat = float(lat_str)
+                    lon = float(lon_str)
                 except ValueError:
-                    logger.debug(f"Skipping park {pota_ref} due to invalid coordinates: lat={row[5]}, lon={row[6]}")
+                    logger.debug("Skipping park %s due to invalid coordinates: lat=%s, lon=%s", pota_ref, lat_str, lon_str)
                     continue
                 
                 # Create Overpass-format element
-                element = {
+                elements.append({
                     'type': 'node',
                     'lat': lat,
                     'lon': lon,
@@ -83,20 +139,14 @@ def fetch_and_parse_csv(force=False):
                         'name': name,
                         'unmapped_osm': 'true'
                     }
-                }
-                elements.append(element)
-                
-            except (IndexError, ValueError) as e:
-                logger.debug(f"Skipping invalid row: {e}")
-                continue
-        
+                })
+            
         result = {'elements': elements, 'version': 0.6, 'generator': 'POTA CSV Parser'}
         logger.info(f"Successfully processed {len(elements)} active parks from CSV")
         
-        # Save data if not forced refresh
-        if not force:
-            save_data(result)
-            update_last_fetch_time()
+        # Save data, including forced reloads, so other workers and the next refresh use it
+        save_data(result)
+        update_last_fetch_time(etag, last_modified)
         
         return result
         
@@ -107,8 +157,7 @@ def fetch_and_parse_csv(force=False):
 def save_data(data):
     """Save the fetched data to a file."""
     try:
-        with open(POTA_DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        atomic_write(POTA_DATA_FILE, orjson.dumps(data))
         logger.info(f"Successfully saved data to {POTA_DATA_FILE}")
     except Exception as e:
         logger.error(f"Error saving data: {e}")
@@ -117,26 +166,40 @@ def load_data():
     """Load data from the cached file."""
     try:
         if os.path.exists(POTA_DATA_FILE):
-            with open(POTA_DATA_FILE, 'r') as f:
-                return json.load(f)
+            with open(POTA_DATA_FILE, 'rb') as f:
+                return orjson.loads(f.read())
     except Exception as e:
         logger.error(f"Error loading cached data: {e}")
     return None
 
 def update_pota_data(force=False):
-    """Main function to update POTA data."""
-    if force or should_fetch_data():
-        logger.info("Fetching new POTA data...")
-        data = fetch_and_parse_csv(force)
+    """Main function to update POTA data.
+
+    Downloads are serialized across threads and worker processes with an flock
+    on FETCH_LOCK_FILE; a caller that waited for another download reuses its
+    result instead of fetching the CSV again.
+    """
+    requested_at = datetime.now()
+    if not force and not should_fetch_data():
+        logger.info("Using cached POTA data (less than 1 hour old)")
+        return load_data()
+    
+    with open(FETCH_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
         
-        if not data:
-            logger.warning("Failed to fetch new data, trying to load cached data")
+        last_fetch = get_last_fetch_time()
+        if last_fetch is not None and last_fetch >= requested_at:
+            logger.info("POTA data was fetched while waiting, reusing it")
             return load_data()
         
-        return data
-    else:
-        logger.info("Using cached POTA data (less than 1 hour old)")
+        logger.info("Fetching new POTA data...")
+        data = fetch_and_parse_csv(force)
+    
+    if not data:
+        logger.warning("Failed to fetch new data, trying to load cached data")
         return load_data()
+    
+    return data
 
 if __name__ == '__main__':
     update_pota_data()
\ No newline at end of file
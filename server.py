@@ -1,15 +1,28 @@
 import requests
-import json
+import orjson
 import logging
 from flask import Flask, request, Response, jsonify
 from flask_cors import CORS
 from flask_compress import Compress
-import schedule
+import os
+import fcntl
+import random
 import time
+import math
+import gzip
+import brotli
+from collections import OrderedDict
 from datetime import datetime
-from threading import Thread, Lock
+from typing import NamedTuple
+from threading import Timer, Lock
+from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
-from pota_csv_fetcher import update_pota_data
+import re
+import numpy as np
+from rtree import index as rtree_index
+from pota_csv_fetcher import update_pota_data, POTA_DATA_FILE
+from http_session import SESSION, CONNECT_TIMEOUT
+from file_utils import atomic_write
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -17,17 +30,124 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Configure Flask-Compress with Brotli compression
-app.config['COMPRESS_ALGORITHM'] = 'br'  # Use Brotli compression
-app.config['COMPRESS_BR_LEVEL'] = 4      # Balanced Brotli compression level for dynamic content
+# Configure Flask-Compress with Brotli compression, falling back to gzip
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 6       # Bbox payloads are repetitive tag JSON, worth the extra effort
+app.config['COMPRESS_MIN_SIZE'] = 512     # Small bbox replies aren't worth compressing
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
 Compress(app)
 
-# Global variables to store the cached data and metadata
+class OverpassError(Exception):
+    """Overpass answered HTTP 200 but reported a runtime error, so its elements are incomplete."""
+
+class CacheSnapshot(NamedTuple):
+    """Everything a request needs from one refresh.
+
+    Elements are only kept as their pre-encoded JSON bytes, with coordinates
+    held in the spatial index, so the parsed dicts are freed after a refresh.
+    """
+    element_blobs: list
+    spatial_index: dict
+
+class ResponseCache:
+    """Thread-safe LRU of encoded response bodies, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes, max_entry_bytes):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size):
+        if size > self.max_entry_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+# Global variables to store the cached data and metadata.
+# cached_data is replaced wholesale on every refresh and never mutated afterwards,
+# so readers take a local reference to it without locking.
 cached_data = None
 last_cache_update = None
 cache_refresh_count = 0
-schedule_thread = None
-cache_lock = Lock()
+refresh_timer = None
+
+# Only one process refreshes from upstream at a time; it holds an flock on
+# REFRESH_LOCK_FILE for its lifetime, and every other worker reloads CACHE_FILE
+# whenever its mtime changes. merged_pota_mtime is the POTA_DATA_FILE mtime
+# as of the last refresh, so a /reload2024 from any worker gets merged in.
+refresh_lock_file = None
+loaded_cache_mtime = None
+last_refresh_attempt = 0
+merged_pota_mtime = None
+last_stale_warning = 0
+server_start_time = time.time()
+scheduler_lock = Lock()
+
+POTA_TAG = 'communication:amateur_radio:pota'
+
+# The planet is queried as two hemisphere tiles (south, west, north, east) so
+# each Overpass request stays smaller than a planet-wide one; both run at once
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_TILES = [(-90, -180, 90, 0), (-90, 0, 90, 180)]
+OVERPASS_MAX_CONCURRENT_QUERIES = 2
+# Server-side limit sent as [timeout:] in the query; the read timeout leaves
+# Overpass a little slack to send its own timeout remark first
+OVERPASS_QUERY_TIMEOUT = 180
+OVERPASS_READ_TIMEOUT = OVERPASS_QUERY_TIMEOUT + 15
+
+REFRESH_INTERVAL = 5 * 60  # seconds between cache refreshes
+SCHEDULER_TICK = 30        # seconds between checks for a refresh or a newer cache file
+STARTUP_JITTER = 5         # max seconds each worker waits before its first check
+# Workers that don't hold the refresh lock warn when the shared cache file is
+# older than this, since the worker holding it is then failing or stuck
+STALE_CACHE_WARNING_AGE = 3 * REFRESH_INTERVAL
+
+# Last merged cache, written after every refresh and served on startup
+CACHE_FILE = "overpass_cache.json"
+REFRESH_LOCK_FILE = CACHE_FILE + ".lock"
+
+# Query boxes are widened to this many decimals (~100 m) so repeated map
+# viewports share entries in the response cache
+BBOX_CACHE_PRECISION = 3
+
+# The response cache is bounded by total bytes per worker; zoomed-out bodies
+# larger than the per-entry limit are rebuilt on every request instead
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+RESPONSE_CACHE_MAX_ENTRY_BYTES = 2 * 1024 * 1024
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES)
+
+# ~10 cm resolution; OSM's 7th decimal only inflates the JSON payload
+COORDINATE_PRECISION = 6
+
+# Bounding box filter "(south,west,north,east)" inside an Overpass QL query;
+# numbers may be signed, start with a dot or use exponent notation (e.g. 1e-7)
+BBOX_NUMBER = r'\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*'
+BBOX_RE = re.compile(r'\(' + ','.join([BBOX_NUMBER] * 4) + r'\)')
+
+# Envelope around the pre-encoded element blobs in /api/interpreter responses
+RESPONSE_HEAD = b'{"elements":['
+RESPONSE_TAIL = b'],"version":0.6,"generator":"Overpass API POTA Cache"}'
 
 def merge_pota_data(overpass_data, pota_data):
     """Merge POTA data with Overpass data, with Overpass taking precedence for matching references."""
@@ -37,115 +157,311 @@ def merge_pota_data(overpass_data, pota_data):
     if 'elements' not in overpass_data:
         overpass_data['elements'] = []
     
-    # Create a set of POTA references from Overpass data
-    overpass_refs = set()
-    for element in overpass_data['elements']:
-        if 'tags' in element and 'communication:amateur_radio:pota' in element['tags']:
-            overpass_refs.add(element['tags']['communication:amateur_radio:pota'])
+    # Create a set of POTA references from Overpass data in a single pass
+    overpass_refs = {element.get('tags', {}).get(POTA_TAG) for element in overpass_data['elements']}
+    overpass_refs.discard(None)
     
     # Add POTA elements that don't exist in Overpass data
+    missing_elements = []
     for element in pota_data['elements']:
-        if 'tags' in element and 'communication:amateur_radio:pota' in element['tags']:
-            pota_ref = element['tags']['communication:amateur_radio:pota']
-            if pota_ref not in overpass_refs:
-                overpass_data['elements'].append(element)
+        pota_ref = element.get('tags', {}).get(POTA_TAG)
+        if pota_ref is not None and pota_ref not in overpass_refs:
+            missing_elements.append(element)
+    overpass_data['elements'].extend(missing_elements)
     
     return overpass_data
 
-def fetch_overpass_data():
-    global cached_data, last_cache_update, cache_refresh_count
-    overpass_url = "https://overpass-api.de/api/interpreter"
-    overpass_query = """
-    [out:json];
+def fetch_overpass_tile(tile):
+    """Query the Overpass API for every POTA-tagged node, way and relation inside one tile."""
+    south, west, north, east = tile
+    # A bbox filter rather than the global [bbox:...] setting, so `out geom`
+    # still returns the full geometry of ways that cross the tile edge
+    overpass_query = f"""
+    [out:json][timeout:{OVERPASS_QUERY_TIMEOUT}];
     (
-      nwr["communication:amateur_radio:pota"];
+      nwr["communication:amateur_radio:pota"]({south},{west},{north},{east});
     );
     out geom;
     """
+    response = SESSION.get(OVERPASS_URL, params={'data': overpass_query},
+                           timeout=(CONNECT_TIMEOUT, OVERPASS_READ_TIMEOUT))
+    response.raise_for_status()
+    tile_data = orjson.loads(response.content)
+    
+    # Timeouts and out-of-memory errors still return 200, with a remark and truncated elements
+    if 'remark' in tile_data:
+        raise OverpassError(f"Overpass error for tile {tile}: {tile_data['remark']}")
+    return tile_data
+
+def fetch_overpass_elements():
+    """Query all tiles concurrently and merge them, dropping elements seen in more than one tile."""
+    with ThreadPoolExecutor(max_workers=OVERPASS_MAX_CONCURRENT_QUERIES) as executor:
+        tile_results = list(executor.map(fetch_overpass_tile, OVERPASS_TILES))
+    
+    seen = set()
+    elements = []
+    for tile_data in tile_results:
+        for element in tile_data.get('elements', []):
+            key = (element['type'], element['id'])
+            if key not in seen:
+                seen.add(key)
+                elements.append(element)
+    return {'elements': elements}
+
+def element_bounds(element):
+    """Return (minlon, minlat, maxlon, maxlat) for a way or relation, or None if it has no coordinates."""
+    if 'bounds' in element:
+        bounds = element['bounds']
+        return bounds['minlon'], bounds['minlat'], bounds['maxlon'], bounds['maxlat']
+    if 'geometry' in element:
+        points = [(point['lon'], point['lat']) for point in element['geometry']
+                  if point.get('lat') is not None and point.get('lon') is not None]
+        if points:
+            lons, lats = zip(*points)
+            return min(lons), min(lats), max(lons), max(lats)
+    return None
+
+def build_spatial_index(elements):
+    """Index element positions for bbox queries.
+
+    Node coordinates are kept as NumPy arrays so a query is a vectorized mask;
+    ways and relations are bulk-loaded into an R-tree over their bounding boxes.
+    """
+    node_positions, node_lats, node_lons = [], [], []
+    shape_entries = []
+    for i, element in enumerate(elements):
+        element_type = element.get('type')
+        if element_type == 'node':
+            lat, lon = element.get('lat'), element.get('lon')
+            if lat is not None and lon is not None:
+                node_positions.append(i)
+                node_lats.append(lat)
+                node_lons.append(lon)
+        elif element_type in ['way', 'relation']:
+            bounds = element_bounds(element)
+            if bounds is not None:
+                shape_entries.append((i, bounds, None))
     
-    with cache_lock:
+    return {
+        'node_positions': np.array(node_positions, dtype=np.intp),
+        'node_lats': np.array(node_lats, dtype=np.float64),
+        'node_lons': np.array(node_lons, dtype=np.float64),
+        'shapes': rtree_index.Index(shape_entries) if shape_entries else rtree_index.Index()
+    }
+
+def encode_elements(elements):
+    """Encode every element to JSON once per refresh so requests only join bytes."""
+    return [orjson.dumps(element) for element in elements]
+
+def fetch_overpass_data():
+    """Fetch, merge and publish a new cache snapshot; returns None if the fetch failed."""
+    global cached_data, last_cache_update, cache_refresh_count, merged_pota_mtime
+    try:
+        start_time = time.time()
+        # Fetch Overpass API data and POTA data concurrently
         try:
-            start_time = time.time()
-            # Fetch Overpass API data
-            response = requests.get(overpass_url, params={'data': overpass_query})
-            response.raise_for_status()
-            overpass_data = response.json()
-            
-            # Fetch POTA data and merge with Overpass data
-            pota_data = update_pota_data()
-            cached_data = merge_pota_data(overpass_data, pota_data)
-            
-            last_cache_update = time.time()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                overpass_future = executor.submit(fetch_overpass_elements)
+                pota_future = executor.submit(update_pota_data)
+                overpass_data = overpass_future.result()
+                pota_data = pota_future.result()
+        finally:
+            # Even when Overpass fails, so a reloaded POTA file isn't retried every tick
+            merged_pota_mtime = file_mtime(POTA_DATA_FILE)
+        
+        merged_data = merge_pota_data(overpass_data, pota_data)
+        
+        # Prepare elements once here, before they're encoded, so requests never mutate the cache
+        for element in merged_data['elements']:
+            round_coordinates(element)
+            if element.get('type') in ['way', 'relation']:
+                add_pota_tag_to_subelements(element)
+        
+        new_cached = build_snapshot(merged_data['elements'])
+        
+        # Publish the new snapshot with a single reference assignment
+        cached_data = new_cached
+        last_cache_update = time.time()
+        cache_refresh_count += 1
+        # Responses built from the previous snapshot can never be served again
+        response_cache.clear()
+        
+        processing_time = last_cache_update - start_time
+        logger.info(f"Cache refreshed (#{cache_refresh_count}). Total elements: {len(new_cached.element_blobs)}. "
+                    f"Cache updated at: {time.ctime(last_cache_update)}. Processing time: {processing_time:.2f} seconds")
+        
+        save_cached_data(new_cached)
+        return new_cached
+    except (requests.RequestException, orjson.JSONDecodeError, OverpassError) as e:
+        logger.error(f"Failed to fetch data: {str(e)}")
+        return None
+
+def build_snapshot(elements):
+    """Encode and index prepared elements into a new cache snapshot."""
+    return CacheSnapshot(
+        element_blobs=encode_elements(elements),
+        spatial_index=build_spatial_index(elements)
+    )
+
+def save_cached_data(snapshot):
+    """Persist the snapshot's elements for other workers and the next startup."""
+    global loaded_cache_mtime
+    try:
+        atomic_write(CACHE_FILE, RESPONSE_HEAD + b','.join(snapshot.element_blobs) + RESPONSE_TAIL)
+        loaded_cache_mtime = os.path.getmtime(CACHE_FILE)
+    except Exception as e:
+        logger.error(f"Error saving cache file: {e}")
+
+def load_cached_data():
+    """Publish the cache persisted by the refreshing worker or a previous run."""
+    global cached_data, last_cache_update, cache_refresh_count, loaded_cache_mtime
+    try:
+        if os.path.exists(CACHE_FILE):
+            with open(CACHE_FILE, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                elements = orjson.loads(f.read())['elements']
+            cached_data = build_snapshot(elements)
+            last_cache_update = mtime
+            loaded_cache_mtime = mtime
             cache_refresh_count += 1
-            processing_time = last_cache_update - start_time
-            logger.info(f"Cache refreshed (#{cache_refresh_count}). Total elements: {len(cached_data['elements'])}. "
-                        f"Cache updated at: {time.ctime(last_cache_update)}. Processing time: {processing_time:.2f} seconds")
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch data: {str(e)}")
+            response_cache.clear()
+            logger.info(f"Loaded {len(elements)} cached elements from {CACHE_FILE}, "
+                        f"last updated at: {time.ctime(last_cache_update)}")
+    except Exception as e:
+        logger.error(f"Error loading cache file: {e}")
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def reload_cached_data_if_changed():
+    mtime = file_mtime(CACHE_FILE)
+    if mtime is not None and mtime != loaded_cache_mtime:
+        load_cached_data()
+
+def warn_if_refresh_stalled():
+    """Log, at most once per REFRESH_INTERVAL, when the refreshing worker stops updating CACHE_FILE."""
+    global last_stale_warning
+    now = time.time()
+    mtime = file_mtime(CACHE_FILE)
+    cache_age = now - (mtime if mtime is not None else server_start_time)
+    if cache_age >= STALE_CACHE_WARNING_AGE and now - last_stale_warning >= REFRESH_INTERVAL:
+        last_stale_warning = now
+        logger.warning(f"{CACHE_FILE} has not been updated for {cache_age:.0f} seconds; "
+                       f"the worker holding {REFRESH_LOCK_FILE} may be stuck or failing")
+
+def acquire_refresh_lock():
+    """Try to become, or confirm this process is, the one that refreshes the cache.
+
+    The flock is held until the process exits, so if the refreshing worker
+    dies the kernel releases it and another worker takes over on its next tick.
+    """
+    global refresh_lock_file
+    if refresh_lock_file is not None:
+        return True
+    
+    lock_file = open(REFRESH_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    
+    refresh_lock_file = lock_file
+    logger.info(f"Process {os.getpid()} is now refreshing the cache")
+    return True
+
+def round_point(point):
+    if point and 'lat' in point and 'lon' in point:
+        point['lat'] = round(point['lat'], COORDINATE_PRECISION)
+        point['lon'] = round(point['lon'], COORDINATE_PRECISION)
+
+def round_coordinates(element):
+    """Round node and geometry coordinates in place to COORDINATE_PRECISION decimals."""
+    round_point(element)
+    for point in element.get('geometry') or []:
+        round_point(point)
+    for member in element.get('members') or []:
+        round_point(member)
+        for point in member.get('geometry') or []:
+            round_point(point)
+    return element
 
 def add_pota_tag_to_subelements(element):
-    pota_value = element['tags'].get('communication:amateur_radio:pota', 'yes')
+    pota_value = element['tags'].get(POTA_TAG, 'yes')
     
     if element['type'] == 'way':
-        if 'geometry' in element:
-            for node in element['geometry']:
-                if 'tags' not in node:
-                    node['tags'] = {}
-                node['tags']['communication:amateur_radio:pota'] = pota_value
+        for node in element.get('geometry', []):
+            node.setdefault('tags', {})[POTA_TAG] = pota_value
     elif element['type'] == 'relation':
-        if 'members' in element:
-            for member in element['members']:
-                if member['type'] == 'way':
-                    if 'tags' not in member:
-                        member['tags'] = {}
-                    member['tags']['communication:amateur_radio:pota'] = pota_value
+        for member in element.get('members', []):
+            if member['type'] == 'way':
+                member.setdefault('tags', {})[POTA_TAG] = pota_value
     return element
 
 def filter_data(south, west, north, east):
-    with cache_lock:
-        if cached_data is None:
-            logger.warning("No cached data available")
-            return None
-        
-        filtered_elements = []
-        for element in cached_data['elements']:
-            if 'type' in element:
-                if element['type'] == 'node':
-                    lat, lon = element.get('lat'), element.get('lon')
-                    if lat is not None and lon is not None:
-                        if south <= lat <= north and west <= lon <= east:
-                            filtered_elements.append(element)
-                elif element['type'] in ['way', 'relation']:
-                    if 'bounds' in element:
-                        bounds = element['bounds']
-                        if (south <= bounds['minlat'] <= north or south <= bounds['maxlat'] <= north) and \
-                           (west <= bounds['minlon'] <= east or west <= bounds['maxlon'] <= east):
-                            filtered_elements.append(add_pota_tag_to_subelements(element))
-                    elif 'geometry' in element:
-                        for point in element['geometry']:
-                            lat, lon = point.get('lat'), point.get('lon')
-                            if lat is not None and lon is not None:
-                                if south <= lat <= north and west <= lon <= east:
-                                    filtered_elements.append(add_pota_tag_to_subelements(element))
-                                    break
-        
-        logger.info(f"Filtered {len(filtered_elements)} elements out of {len(cached_data['elements'])}")
-        return {'elements': filtered_elements, 'version': 0.6, 'generator': 'Overpass API POTA Cache'}
+    """Return the pre-encoded JSON blobs of the cached elements inside the bounding box."""
+    snapshot = cached_data
+    if snapshot is None:
+        logger.warning("No cached data available")
+        return None
+    
+    hits = []
+    # The R-tree rejects inverted boxes; those never matched anything anyway
+    if south <= north and west <= east:
+        spatial_index = snapshot.spatial_index
+        node_lats, node_lons = spatial_index['node_lats'], spatial_index['node_lons']
+        node_mask = (node_lats >= south) & (node_lats <= north) & (node_lons >= west) & (node_lons <= east)
+        hits = spatial_index['node_positions'][node_mask].tolist()
+        hits.extend(spatial_index['shapes'].intersection((west, south, east, north)))
+        hits.sort()
+    
+    logger.info(f"Filtered {len(hits)} elements out of {len(snapshot.element_blobs)}")
+    element_blobs = snapshot.element_blobs
+    return [element_blobs[i] for i in hits]
+
+def round_bbox(south, west, north, east):
+    """Clamp a bounding box to valid coordinates and round it outwards to BBOX_CACHE_PRECISION decimals."""
+    # Clamping keeps infinite values (e.g. 1e999) away from floor/ceil and lets
+    # zoomed-out viewports share one response cache entry
+    south, north = (min(max(lat, -90.0), 90.0) for lat in (south, north))
+    west, east = (min(max(lon, -180.0), 180.0) for lon in (west, east))
+    scale = 10 ** BBOX_CACHE_PRECISION
+    return (math.floor(south * scale) / scale, math.floor(west * scale) / scale,
+            math.ceil(north * scale) / scale, math.ceil(east * scale) / scale)
+
+def choose_content_encoding():
+    """Pick the client's preferred encoding among COMPRESS_ALGORITHM; ties go to the server's order."""
+    return request.accept_encodings.best_match(app.config['COMPRESS_ALGORITHM'])
+
+def build_response_body(south, west, north, east, encoding):
+    """Return (element count, body, content encoding) for a bbox, compressed when worthwhile."""
+    filtered_blobs = filter_data(south, west, north, east)
+    body = RESPONSE_HEAD + b','.join(filtered_blobs) + RESPONSE_TAIL
+    if encoding is None or len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return len(filtered_blobs), body, None
+    if encoding == 'br':
+        body = brotli.compress(body, quality=app.config['COMPRESS_BR_LEVEL'])
+    else:
+        body = gzip.compress(body, compresslevel=app.config.get('COMPRESS_LEVEL', 6))
+    return len(filtered_blobs), body, encoding
 
 def parse_query(query):
-    try:
-        # Check if the query is URL-encoded
-        if '%' in query:
-            query = urllib.parse.unquote(query)
-        
-        # Extract bounding box from the query
-        bbox = query.split('(')[1].split(')')[0].split(',')
-        south, west, north, east = map(float, bbox)
-        logger.info(f"Extracted bounding box: {south}, {west}, {north}, {east}")
-        return south, west, north, east
-    except (IndexError, ValueError) as e:
-        logger.error(f"Invalid query format: {str(e)}")
+    # Check if the query is URL-encoded
+    if '%' in query:
+        query = urllib.parse.unquote(query)
+    
+    # Extract bounding box from the query
+    match = BBOX_RE.search(query)
+    if match is None:
+        logger.error("Invalid query format: no bounding box found")
         return None
+    
+    south, west, north, east = map(float, match.groups())
+    logger.info(f"Extracted bounding box: {south}, {west}, {north}, {east}")
+    return south, west, north, east
 
 @app.route('/api/interpreter', methods=['GET', 'POST'])
 @app.route('/api/overpass', methods=['GET', 'POST'])
@@ -166,28 +482,47 @@ def query_data():
     if bbox is None:
         return Response("Invalid query format", status=400)
 
-    south, west, north, east = bbox
-    filtered_data = filter_data(south, west, north, east)
-    if filtered_data is None:
+    if cached_data is None:
         logger.error("No cached data available")
         return Response("No cached data available", status=503)
 
+    south, west, north, east = round_bbox(*bbox)
+    # Bodies are cached already compressed, so a repeat viewport skips both
+    # filtering and compression; keyed per cache generation and encoding
+    encoding = choose_content_encoding()
+    cache_key = (south, west, north, east, cache_refresh_count, encoding)
+    cached_response = response_cache.get(cache_key)
+    if cached_response is None:
+        cached_response = build_response_body(south, west, north, east, encoding)
+        response_cache.set(cache_key, cached_response, len(cached_response[1]))
+    element_count, body, content_encoding = cached_response
+
     processing_time = time.time() - start_time
-    logger.info(f"Returning {len(filtered_data['elements'])} elements from cache. "
+    logger.info(f"Returning {element_count} elements from cache. "
                 f"Last cache update: {time.ctime(last_cache_update)}. "
                 f"Processing time: {processing_time:.2f} seconds")
     
-    return Response(json.dumps(filtered_data), mimetype='application/json')
+    # Flask-Compress leaves responses that already carry a Content-Encoding alone,
+    # but still adds Vary: Accept-Encoding to them
+    response = Response(body, mimetype='application/json')
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    return response
 
 @app.route('/reload2024', methods=['GET'])
 def force_reload():
-    """Force reload of POTA data."""
+    """Force reload of POTA data.
+
+    The download shares update_pota_data's lock with the scheduled refresh, and
+    the refreshing worker merges the new file into the cache on its next tick.
+    """
     try:
         data = update_pota_data(force=True)
         if data:
             return jsonify({
                 "status": "success",
-                "message": f"POTA data reloaded with {len(data['elements'])} elements",
+                "message": f"POTA data reloaded with {len(data['elements'])} elements; "
+                           "the cache is rebuilt with it on the next scheduler tick",
                 "timestamp": datetime.now().isoformat()
             })
         else:
@@ -205,44 +540,73 @@ def force_reload():
 
 @app.route('/api/cache_status', methods=['GET'])
 def cache_status():
-    with cache_lock:
-        if cached_data is None:
-            return jsonify({
-                "status": "No data cached",
-                "elements_count": 0,
-                "last_update": None,
-                "cache_refresh_count": cache_refresh_count
-            })
-        
+    snapshot = cached_data
+    if snapshot is None:
         return jsonify({
-            "status": "Cache available",
-            "elements_count": len(cached_data['elements']),
-            "last_update": time.ctime(last_cache_update),
+            "status": "No data cached",
+            "elements_count": 0,
+            "last_update": None,
             "cache_refresh_count": cache_refresh_count
         })
+    
+    return jsonify({
+        "status": "Cache available",
+        "elements_count": len(snapshot.element_blobs),
+        "last_update": time.ctime(last_cache_update),
+        "cache_refresh_count": cache_refresh_count
+    })
 
-def run_schedule():
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+def schedule_next_refresh(delay=SCHEDULER_TICK):
+    """Arm a one-shot timer for the next scheduler tick."""
+    global refresh_timer
+    refresh_timer = Timer(delay, run_scheduled_refresh)
+    refresh_timer.daemon = True
+    refresh_timer.start()
 
-def start_scheduler():
-    global schedule_thread
-    # Schedule data fetching every 5 minutes
-    schedule.every(5).minutes.do(fetch_overpass_data)
+def run_scheduled_refresh():
+    global last_refresh_attempt
+    try:
+        if acquire_refresh_lock():
+            # Refresh once the shared cache is stale, but don't retry a failed refresh every tick;
+            # POTA data reloaded since the last refresh is merged in right away
+            now = time.time()
+            mtime = file_mtime(CACHE_FILE)
+            cache_age = now - mtime if mtime is not None else math.inf
+            pota_mtime = file_mtime(POTA_DATA_FILE)
+            pota_reloaded = pota_mtime is not None and pota_mtime != merged_pota_mtime and \
+                (mtime is None or pota_mtime > mtime)
+            if pota_reloaded or (cache_age >= REFRESH_INTERVAL and now - last_refresh_attempt >= REFRESH_INTERVAL):
+                last_refresh_attempt = now
+                fetch_overpass_data()
+            else:
+                reload_cached_data_if_changed()
+        else:
+            reload_cached_data_if_changed()
+            warn_if_refresh_stalled()
+    finally:
+        schedule_next_refresh()
 
-    # Create and start the scheduler thread if it's not already running
-    if schedule_thread is None or not schedule_thread.is_alive():
-        schedule_thread = Thread(target=run_schedule)
-        schedule_thread.daemon = True
-        schedule_thread.start()
+def start_scheduler():
+    # Arm the scheduler timer if it's not already running; it re-arms itself
+    # after every tick. The first tick is jittered so workers forked together
+    # don't all race for the refresh lock at the same instant.
+    with scheduler_lock:
+        if refresh_timer is None or not refresh_timer.is_alive():
+            schedule_next_refresh(delay=random.uniform(0, STARTUP_JITTER))
 
-# Fetch data initially
-fetch_overpass_data()
+@app.before_request
+def ensure_scheduler():
+    # Entry points other than gunicorn.conf.py and __main__ (e.g. `flask run`
+    # or another WSGI server) start the scheduler on their first request
+    if refresh_timer is None:
+        start_scheduler()
 
-# Start the scheduler
-start_scheduler()
+# Serve the last persisted cache immediately; the scheduler refreshes it in the background
+load_cached_data()
 
 if __name__ == '__main__':
+    # Start the scheduler; under gunicorn each worker starts its own from the post_fork hook
+    start_scheduler()
+    
     # Run the Flask app
-    app.run(debug=True, host='0.0.0.0', port=5005)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5005)
\ No newline at end of file
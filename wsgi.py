@@ -1,4 +1,5 @@
-from server import app
+from server import app, start_scheduler
 
 if __name__ == "__main__":
+    start_scheduler()
     app.run()
\ No newline at end of file